@@ -1,42 +1,61 @@
 from __future__ import annotations
 
+import sys
 import uuid
 import time
-from typing import Dict, List, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from agents.models import LLM_MODEL
+from agents.models import get_model
 from langchain.messages import AIMessage, HumanMessage
 
 from agents.syncraft_agent import SyncraftAgent
+from agents.response_cache import LLMCache, SemanticCache, hash_json, load_embedding_model, make_scope
+from agents.session_store import SessionConflictError, SessionStore, SQLiteSessionStore
 
-from app.state.graph_state import reset_graph_state, load_graph
+from app.state.graph_state import reset_graph_state, load_graph, load_graph_json
 from app.state.product_state import reset_products, load_products
 
 
-# Simple in-memory session store: session_id -> list of BaseMessage
-_session_store: Dict[str, List] = {}
-_model = None
+# Persistent session store: session_id -> Session(messages, display, version).
+# The UI only ever appends, so the display list is kept in step with the messages.
+_session_store: SessionStore = SQLiteSessionStore()
+_SAVE_RETRIES = 5
 _agent: SyncraftAgent | None = None
+_response_cache = LLMCache()
+_semantic_cache = SemanticCache(ttl_seconds=_response_cache.ttl_seconds)
+# Until the embedder is ready, semantic lookups are plain misses.
+load_embedding_model()
 
 
-def _get_model():
-    global _model
-    if _model is None:
-        _model = LLM_MODEL
-    return _model
+def _build_agent() -> SyncraftAgent:
+    return SyncraftAgent(model=get_model())
 
 
 def _get_agent() -> SyncraftAgent:
     global _agent
+
+    # In Streamlit, keep one agent per server process in cache_resource: it is
+    # shared by all browser sessions (their conversations are separate threads)
+    # and survives reruns and hot reloads of this module.
+    # Only look at an already imported streamlit; the CLI never pays for the import.
+    st = sys.modules.get("streamlit")
+    if st is not None and st.runtime.exists():
+        return st.cache_resource(show_spinner=False)(_build_agent)()
+
     if _agent is None:
-        _agent = SyncraftAgent(model=_get_model())
+        _agent = _build_agent()
     return _agent
 
 
-def _get_history(session_id: str) -> List:
-    if session_id not in _session_store:
-        _session_store[session_id] = []
-    return _session_store[session_id]
+def _state_hash() -> str:
+    """Hash of the simulation state the agent reasons about."""
+    return hash_json({"graph": load_graph_json(), "products": load_products()})
+
+
+def _state_names() -> List[str]:
+    """Station and product labels, which a semantic cache hit must agree on."""
+    stations = [str(node["id"]) for node in load_graph_json().get("nodes", [])]
+    return stations + [str(p["label"]) for p in load_products() if "label" in p]
 
 
 def reset_session(session_id: str) -> None:
@@ -44,9 +63,7 @@ def reset_session(session_id: str) -> None:
     Clear stored history and agent state for a session.
     In Streamlit Cloud, ensures files are properly reset and reloaded.
     """
-    global _agent
-
-    _session_store[session_id] = []
+    _session_store.delete(session_id)
     reset_products()
     reset_graph_state()
     
@@ -57,44 +74,134 @@ def reset_session(session_id: str) -> None:
     _ = load_graph()
     _ = load_products()
 
-    _agent = None 
-    _agent = _get_agent()
+    # Conversations are keyed by session id, so only this session's thread is dropped.
+    _get_agent().forget_thread(session_id)
 
 
 
 def get_display_history(session_id: str) -> List[dict]:
     """Return UI-friendly history for a session."""
-    history = _get_history(session_id)
-    return [
-        {"role": "assistant" if isinstance(m, AIMessage) else "user", "content": m.content}
-        for m in history
-    ]
+    return _session_store.load(session_id).display
+
+
+def resume_session(session_id: str) -> List[dict]:
+    """
+    Continue a stored session, e.g. after a page reload or server restart.
+    Seeds the agent's conversation from the store if this process has none
+    for it yet, and returns the UI-friendly history.
+    """
+    session = _session_store.load(session_id)
+    if session.messages:
+        agent = _get_agent()
+        if not agent.thread_messages(session_id):
+            agent.append_to_thread(session_id, session.messages)
+    return session.display
 
 
 def new_session_id() -> str:
     return str(uuid.uuid4())
 
 
+def _history_hash(agent: SyncraftAgent, session_id: str) -> str:
+    """Hash of the conversation the model sees for this session so far."""
+    return hash_json([(m.type, m.text) for m in agent.thread_messages(session_id)])
+
+
+def _lookup_reply(
+    agent: SyncraftAgent, session_id: str, user_message: str
+) -> Tuple[Optional[str], Callable[[str], None]]:
+    """
+    Look the message up in the response caches.
+    Returns (cached_reply, remember) where ``remember(reply)`` stores a freshly
+    generated reply once the turn is done.
+    """
+    if not _response_cache.is_cacheable(user_message):
+        return None, lambda reply: None
+
+    state_hash = _state_hash()
+    scope = make_scope(agent.sys_prompt, state_hash, _history_hash(agent, session_id))
+    cache_key = _response_cache.make_key(scope, user_message)
+
+    response_text = _response_cache.get(cache_key)
+    if response_text is None:
+        names = _state_names()
+        response_text = _semantic_cache.get(scope, user_message, names)
+
+    hit_or_miss = "hit" if response_text is not None else "miss"
+    # Diagnostics go to stderr so they never mix into a reply streamed to stdout.
+    print(
+        f"Response cache {hit_or_miss}: exact={_response_cache.stats()} semantic={_semantic_cache.stats()}",
+        file=sys.stderr,
+    )
+
+    def remember(reply: str) -> None:
+        # Only turns that left the state untouched can be replayed; a cached
+        # "Added station A" would otherwise skip the actual tool calls.
+        if _state_hash() == state_hash:
+            _response_cache.set(cache_key, reply)
+            _semantic_cache.set(scope, user_message, reply, _state_names())
+
+    return response_text, remember
+
+
+def _record_cached_turn(agent: SyncraftAgent, session_id: str, user_message: str, reply: str) -> None:
+    """The model did not run for a cached reply; add the turn to its thread so later turns see it."""
+    agent.append_to_thread(session_id, [HumanMessage(content=user_message), AIMessage(content=reply)])
+
+
+def _persist_turn(session_id: str, user_message: str, response_text: str) -> List[dict]:
+    """Append one user/assistant turn to the session and return the display history."""
+    assistant_msg = AIMessage(content=response_text)
+
+    # load -> append -> save, retrying if another tab saved in between.
+    for attempt in range(_SAVE_RETRIES):
+        session = _session_store.load(session_id)
+        session.messages.extend([HumanMessage(content=user_message), assistant_msg])
+        session.display.extend([
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": assistant_msg.content},
+        ])
+        try:
+            _session_store.save(session_id, session)
+            break
+        except SessionConflictError:
+            if attempt == _SAVE_RETRIES - 1:
+                raise
+
+    return session.display
+
+
 def send_message(session_id: str, user_message: str) -> Tuple[str, List[dict]]:
     """
     Send a user message through the agent.
     Returns (assistant_reply, display_history) where display_history is a list of dicts
     with role/content for UI rendering.
     """
-    agent = _get_agent()
-    history = _get_history(session_id)
-
-    # Directly send the raw user string to the agent
-    response_text = agent.go_to_work(user_instructions=user_message)
-    assistant_msg = AIMessage(content=response_text)
+    # Same turn as stream_message, so both store and cache the same reply text.
+    response_text = "".join(stream_message(session_id=session_id, user_message=user_message))
+    return response_text, get_display_history(session_id)
 
-    # Persist turn
-    history.extend([HumanMessage(content=user_message), assistant_msg])
 
-    # Prepare display-friendly history
-    display_history = [
-        {"role": "assistant" if isinstance(m, AIMessage) else "user", "content": m.content}
-        for m in history
-    ]
-    return assistant_msg.content, display_history
+def stream_message(session_id: str, user_message: str) -> Iterator[str]:
+    """
+    Like ``send_message``, but yields the assistant reply in chunks as the model
+    produces them. The reply is the text of all model calls of the turn, as
+    shown while streaming. The turn is persisted once the reply is complete;
+    use ``get_display_history`` afterwards for the updated history.
+    """
+    agent = _get_agent()
 
+    response_text, remember = _lookup_reply(agent, session_id, user_message)
+    if response_text is not None:
+        _record_cached_turn(agent, session_id, user_message, response_text)
+        yield response_text
+    else:
+        chunks: List[str] = []
+        for chunk in agent.stream_work(user_instructions=user_message, thread_id=session_id):
+            chunks.append(chunk)
+            yield chunk
+        response_text = "".join(chunks)
+        if response_text:
+            remember(response_text)
+
+    _persist_turn(session_id, user_message, response_text)
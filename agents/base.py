@@ -1,41 +1,180 @@
+import threading
 from abc import abstractmethod
+from typing import Dict, Iterable, Iterator, List, Set
+
 from langchain.agents import create_agent
-from langchain.messages import SystemMessage, HumanMessage
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import AIMessage, SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage
 from langgraph.checkpoint.memory import InMemorySaver
+from langchain_anthropic.middleware import AnthropicPromptCachingMiddleware
+
+
+# Anthropic prompt caching: the system prompt is static per agent, so it is
+# sent as a cacheable block and reused across turns for up to an hour.
+PROMPT_CACHE_TTL = "1h"
+
+
+class OrderedToolCalls(AgentMiddleware):
+    """
+    Run the tool calls of one model response in the order they were emitted.
+
+    LangGraph starts all calls of a response at once, but e.g. ``add_node B``
+    followed by ``add_product_route [A, B]`` only works in that order. A call
+    therefore waits for every earlier call of the same response; tools named in
+    ``read_only`` only wait for earlier calls that are not read-only, so
+    consecutive reads still run concurrently.
+    """
+
+    def __init__(self, read_only: Iterable[str] = ()):
+        super().__init__()
+        self.read_only = frozenset(read_only)
+        self._cond = threading.Condition()
+        self._done: Dict[str, Set[str]] = {}  # response (joined call ids) -> finished call ids
+
+    @staticmethod
+    def _batch(request) -> List[dict]:
+        """All tool calls of the AI message that emitted the request's tool call."""
+        call_id = request.tool_call["id"]
+        for msg in reversed(request.state["messages"]):
+            if isinstance(msg, AIMessage) and any(c["id"] == call_id for c in msg.tool_calls):
+                return msg.tool_calls
+        return [request.tool_call]
+
+    def wrap_tool_call(self, request, handler):
+        calls = self._batch(request)
+        if len(calls) == 1:
+            return handler(request)
+
+        call_ids = [c["id"] for c in calls]
+        call_id = request.tool_call["id"]
+        key = "\0".join(call_ids)
+        earlier = calls[: call_ids.index(call_id)]
+        if request.tool_call["name"] in self.read_only:
+            earlier = [c for c in earlier if c["name"] not in self.read_only]
+        wait_for = {c["id"] for c in earlier}
+
+        # Calls are scheduled in order, so the ones waited for are already running.
+        with self._cond:
+            done = self._done.setdefault(key, set())
+            self._cond.wait_for(lambda: done >= wait_for)
+        try:
+            return handler(request)
+        finally:
+            with self._cond:
+                done.add(call_id)
+                if len(done) == len(calls):
+                    del self._done[key]
+                self._cond.notify_all()
 
 
 class Agent:
-    def __init__(self, role, version, sys_prompt, tools, model):
+    def __init__(self, role, version, sys_prompt, tools, model, middleware=None, read_only_tools=()):
         self.role           = role
         self.version        = version
         self.model          = model
         self.tools          = tools
         self.sys_prompt     = sys_prompt
+        self.middleware     = list(middleware or [])
+        self.read_only_tools = frozenset(read_only_tools)
         self.checkpointer   = InMemorySaver()
         self.init_agent()
 
     def init_agent(self):
+        system_message = SystemMessage(content=[
+            {
+                "type": "text",
+                "text": self.sys_prompt,
+                "cache_control": {"type": "ephemeral", "ttl": PROMPT_CACHE_TTL},
+            }
+        ])
+
         # Init agent
         self.agent = create_agent(
             model           = self.model,
             tools           = self.tools,
-            system_prompt   = self.sys_prompt,
+            system_prompt   = system_message,
             checkpointer    = self.checkpointer,
-            middleware      = [],
+            middleware      = [
+                # Marks the latest message so the conversation prefix is cached too
+                AnthropicPromptCachingMiddleware(
+                    ttl=PROMPT_CACHE_TTL,
+                    unsupported_model_behavior="ignore",
+                ),
+                OrderedToolCalls(read_only=self.read_only_tools),
+                *self.middleware,
+            ],
         )
 
-    def invoke(self, user_msg: HumanMessage):
+    def _run_config(self, thread_id: str) -> dict:
+        # One checkpointer thread per chat session, so each invocation continues
+        # that session's conversation. Tool calls of one model turn keep their
+        # order (see OrderedToolCalls); only read-only tools overlap.
+        return {
+            "configurable": {"thread_id": thread_id},
+        }
+
+    def invoke(self, user_msg: HumanMessage, *, thread_id: str):
         messages = [user_msg]
         response = self.agent.invoke(
             {"messages": messages},
-            config={
-                "configurable": {"thread_id": "1"},
-                "max_concurrency": 1,     # 🔒 enforce sequential tool execution
-            }
+            config=self._run_config(thread_id),
         )
         
         return response
 
+    @staticmethod
+    def final_reply(result):
+        """
+        Text of the last AI message in an ``invoke`` result, or None.
+        ``content`` may be a list of blocks (e.g. merged streaming chunks), so use ``text``.
+        """
+        for msg in reversed(result.get("messages", [])):
+            if isinstance(msg, AIMessage):
+                return msg.text
+        return None
+
+    def stream(self, user_msg: HumanMessage, *, thread_id: str) -> Iterator[str]:
+        """
+        Yield the text of the model's replies token by token, or one message
+        at a time for models that do not stream. Replies of successive model
+        calls (before/after tool use) are separated by a blank line.
+        """
+        last_step = None
+        for chunk, metadata in self.agent.stream(
+            {"messages": [user_msg]},
+            config=self._run_config(thread_id),
+            stream_mode="messages",
+        ):
+            # Skip tool results; only model output is shown to the user. Models
+            # that do not stream yield whole AIMessages instead of chunks.
+            if not isinstance(chunk, AIMessage) or metadata.get("langgraph_node") != "model":
+                continue
+            if not chunk.text:
+                continue
+
+            # Separate the text of successive model calls (before/after tool use).
+            step = metadata.get("langgraph_step")
+            if last_step is not None and step != last_step:
+                yield "\n\n"
+            last_step = step
+            yield chunk.text
+
+    def thread_messages(self, thread_id: str) -> List[BaseMessage]:
+        """Messages checkpointed for a session's thread so far."""
+        return self.agent.get_state(self._run_config(thread_id)).values.get("messages", [])
+
+    def append_to_thread(self, thread_id: str, messages: List[BaseMessage]) -> None:
+        """
+        Add messages to a thread without running the model, e.g. a reply served
+        from a cache. ``messages`` must end with a final (tool-call free) AI message.
+        """
+        self.agent.update_state(self._run_config(thread_id), {"messages": messages}, as_node="model")
+
+    def forget_thread(self, thread_id: str) -> None:
+        """Drop the checkpointed conversation of one session."""
+        self.checkpointer.delete_thread(thread_id)
+
     @abstractmethod
     def go_to_work(self, *args, **kwargs):
         """
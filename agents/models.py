@@ -1,28 +1,50 @@
+from functools import lru_cache
+
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 
 
 load_dotenv()
 
-gpt_5_nano = init_chat_model(
-    "openai:gpt-5-nano",
-    temperature=0.5,
-    timeout=30,
-    max_tokens=5000,
-)
-
-mistral_3_8B = init_chat_model(
-    "mistral-small-latest",
-    temperature=0.5,
-    timeout=30,
-    max_tokens=5000,
-)
-
-anthropic = init_chat_model(
-    "anthropic:claude-haiku-4-5",
-    temperature=0.5,
-    timeout=30,
-    max_tokens=5000,
-)
-
-LLM_MODEL = anthropic
\ No newline at end of file
+# Chat models are only initialised on first use, so importing this module
+# does not load every provider SDK and its credentials.
+MODEL_CONFIGS = {
+    "gpt_5_nano": dict(
+        model="openai:gpt-5-nano",
+        temperature=0.5,
+        timeout=30,
+        max_tokens=5000,
+    ),
+    "mistral_3_8B": dict(
+        model="mistral-small-latest",
+        temperature=0.5,
+        timeout=30,
+        max_tokens=5000,
+    ),
+    "anthropic": dict(
+        model="anthropic:claude-haiku-4-5",
+        temperature=0.5,
+        timeout=30,
+        # Tool orchestration replies are short; streaming shows the first tokens early.
+        max_tokens=1024,
+        streaming=True,
+        # Required for the 1h prompt cache TTL used by agents/base.py
+        betas=["extended-cache-ttl-2025-04-11"],
+    ),
+}
+
+DEFAULT_MODEL = "anthropic"
+
+
+@lru_cache(maxsize=None)
+def get_model(name: str = DEFAULT_MODEL):
+    return init_chat_model(**MODEL_CONFIGS[name])
+
+
+def __getattr__(name: str):
+    # Keep ``from agents.models import LLM_MODEL`` / ``anthropic`` working.
+    if name == "LLM_MODEL":
+        return get_model()
+    if name in MODEL_CONFIGS:
+        return get_model(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,18 @@
+import re
+import textwrap
+from functools import lru_cache
+from importlib import resources
+
+
+@lru_cache(maxsize=None)
+def load_prompt(name: str) -> str:
+    """
+    Return the system prompt stored in ``agents/prompts/<name>.txt``.
+
+    The text is normalised once (dedent, collapsed inner whitespace, no
+    trailing spaces or repeated blank lines), so every process sends a
+    bit-identical prompt and Anthropic's prompt cache prefix keeps matching.
+    """
+    text = resources.files(__package__).joinpath(f"{name}.txt").read_text(encoding="utf-8")
+    lines = [re.sub(r"(?<=\S)[ \t]+", " ", line).rstrip() for line in textwrap.dedent(text).splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+"""
+In-process caches for agent responses.
+
+Responses are only reusable while the simulation state and the conversation
+they were produced in are unchanged, so every lookup is scoped by a hash of
+the system prompt, the current graph/product state and the session history.
+"""
+
+import functools
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Requests whose answer depends on something other than the simulation state.
+DEFAULT_EXCLUDE_PATTERNS: Tuple[str, ...] = (
+    r"\bnow\b",
+    r"\bcurrent time\b",
+    r"\btoday\b",
+)
+
+
+def sha256_hex(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_json(data: Any) -> str:
+    """Stable hash of a JSON-serialisable structure."""
+    return sha256_hex(json.dumps(data, sort_keys=True))
+
+
+def normalize_message(user_message: str) -> str:
+    return user_message.strip().lower()
+
+
+def make_scope(sys_prompt: str, state_hash: str, history_hash: str = "") -> str:
+    """
+    Scope shared by all cached responses for one prompt, state and conversation
+    so far; a reply to "yes" or "why?" only holds in the context it was given in.
+    """
+    return hash_json({"sys": sha256_hex(sys_prompt), "graph": state_hash, "history": history_hash})
+
+
+class LLMCache:
+    """
+    Exact-match LRU cache with a TTL, keyed by
+    (system prompt hash, state hash, normalised user message).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        exclude_patterns: Iterable[str] = DEFAULT_EXCLUDE_PATTERNS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.exclude_patterns = [re.compile(p, re.IGNORECASE) for p in exclude_patterns]
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_cacheable(self, user_message: str) -> bool:
+        return not any(p.search(user_message) for p in self.exclude_patterns)
+
+    @staticmethod
+    def make_key(scope: str, user_message: str) -> str:
+        return hash_json({"scope": scope, "user": normalize_message(user_message)})
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, response: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_QUOTED_OR_NUMBER = re.compile(r"\d+(?:\.\d+)?|\"[^\"]+\"|'[^']+'")
+_WORD = re.compile(r"[\w-]+")
+
+
+def extract_entities(user_message: str, names: Iterable[str] = ()) -> FrozenSet[str]:
+    """
+    Lower-cased numbers, quoted strings, capitalised words (except the first)
+    and known ``names`` (e.g. station and product labels) in the message.
+
+    Embeddings barely separate "process time of Press?" from "... of Lathe?",
+    so a semantic hit additionally requires the same entities.
+    """
+    found = set(_QUOTED_OR_NUMBER.findall(user_message))
+    found.update(w for w in _WORD.findall(user_message)[1:] if w[0].isupper())
+    lowered = user_message.lower()
+    found.update(n for n in names if re.search(rf"(?<!\w){re.escape(n.lower())}(?!\w)", lowered))
+    return frozenset(e.lower() for e in found)
+
+
+# The embedder is loaded by a background thread; lookups never wait for it.
+_model: Dict[str, Any] = {"embedder": None, "loader": None}
+_model_lock = threading.Lock()
+
+
+def load_embedding_model() -> None:
+    """Start loading the embedder in the background, if not started already."""
+    with _model_lock:
+        if _model["loader"] is None:
+            _model["loader"] = threading.Thread(target=_load_embedding_model, name="embedding-model", daemon=True)
+            _model["loader"].start()
+
+
+def _load_embedding_model() -> None:
+    """
+    Load the local ONNX embedder, downloading it only if it is not cached yet.
+    If ``fastembed`` or the model is unavailable the semantic cache stays disabled.
+    """
+    try:
+        from fastembed import TextEmbedding
+    except ImportError:
+        print("fastembed not installed, semantic response cache disabled", file=sys.stderr)
+        return
+    try:
+        embedder = TextEmbedding(EMBEDDING_MODEL, local_files_only=True)
+    except Exception:
+        try:
+            embedder = TextEmbedding(EMBEDDING_MODEL)  # download, with fastembed's retries
+        except Exception as exc:
+            print(f"Could not load {EMBEDDING_MODEL} ({exc}), semantic response cache disabled", file=sys.stderr)
+            return
+    _model["embedder"] = embedder
+
+
+def _embedding_model():
+    """The embedder, or None while it is (still) unavailable."""
+    load_embedding_model()
+    return _model["embedder"]
+
+
+def _embed(text: str) -> Optional[np.ndarray]:
+    """Unit-length embedding of ``text``, or None if no embedder is ready."""
+    if _embedding_model() is None:
+        return None
+    return _embed_ready(text)
+
+
+@functools.lru_cache(maxsize=256)
+def _embed_ready(text: str) -> np.ndarray:
+    vec = np.asarray(next(iter(_model["embedder"].embed([text]))), dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class SemanticCache:
+    """
+    Fallback cache matching paraphrased requests by embedding cosine similarity.
+
+    Entries are only compared within the same scope (system prompt, simulation
+    state and history) and with the same entities (see ``extract_entities``),
+    and expire after ``ttl_seconds`` like those of ``LLMCache``. Embeddings live in one preallocated matrix; once ``max_entries`` is
+    reached the least recently used row is overwritten.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.93,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim), unit rows, first _size used
+        self._inserted = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._size = 0
+        self._responses: List[str] = []
+        self._scopes: List[str] = []
+        self._entities: List[FrozenSet[str]] = []
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, user_message: str, names: Iterable[str] = ()) -> Optional[str]:
+        query = _embed(normalize_message(user_message))
+        entities = extract_entities(user_message, names)
+        with self._lock:
+            n = self._size
+            if query is None or n == 0:
+                self.misses += 1
+                return None
+
+            now = time.monotonic()
+            candidates = np.fromiter(
+                (s == scope and e == entities for s, e in zip(self._scopes, self._entities)),
+                dtype=bool,
+                count=n,
+            )
+            candidates &= now - self._inserted[:n] <= self.ttl_seconds
+            if not candidates.any():
+                self.misses += 1
+                return None
+
+            # Rows are unit length, so a single matmul yields the cosine scores.
+            scores = np.where(candidates, self._matrix[:n] @ query, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return self._responses[best]
+
+    def set(self, scope: str, user_message: str, response: str, names: Iterable[str] = ()) -> None:
+        vec = _embed(normalize_message(user_message))
+        if vec is None:
+            return
+        entities = extract_entities(user_message, names)
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((self.max_entries, vec.shape[0]), dtype=np.float32)
+
+            if self._size < self.max_entries:
+                row = self._size
+                self._size += 1
+                self._responses.append(response)
+                self._scopes.append(scope)
+                self._entities.append(entities)
+            else:
+                row = int(np.argmin(self._last_used))
+                self._responses[row] = response
+                self._scopes[row] = scope
+                self._entities[row] = entities
+
+            self._matrix[row] = vec
+            self._inserted[row] = self._last_used[row] = time.monotonic()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._inserted[:] = 0.0
+            self._last_used[:] = 0.0
+            self._size = 0
+            self._responses.clear()
+            self._scopes.clear()
+            self._entities.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": self._size}
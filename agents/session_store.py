@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+"""
+Chat session persistence for ``agents.agent_connector``.
+
+A session holds the LangChain message history and its UI-friendly display
+form. Stores use optimistic concurrency: every save must carry the version
+that was loaded, otherwise ``SessionConflictError`` is raised and the caller
+reloads and retries instead of silently overwriting another tab's turn.
+
+Sessions untouched for ``SESSION_TTL_SECONDS`` expire; the SQLite store purges
+them whenever a new session is first saved.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Protocol
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+
+_STATE_DIR = Path(__file__).resolve().parents[1] / "app" / "state"
+SESSIONS_PATH = _STATE_DIR / "sessions.db"
+SESSION_TTL_SECONDS = 7 * 24 * 3600
+
+
+class SessionConflictError(Exception):
+    """The session was saved by someone else since it was loaded."""
+
+
+@dataclass
+class Session:
+    messages: List = field(default_factory=list)
+    display: List[dict] = field(default_factory=list)
+    user_id: str = ""
+    version: int = 0  # 0 means not stored yet
+
+
+class SessionStore(Protocol):
+    def load(self, session_id: str) -> Session:
+        """Return the stored session, or a new empty one."""
+        ...
+
+    def save(self, session_id: str, session: Session) -> None:
+        """Persist ``session`` and bump its version, or raise ``SessionConflictError``."""
+        ...
+
+    def delete(self, session_id: str) -> None:
+        ...
+
+
+class InMemorySessionStore:
+    """Process-local store, e.g. for tests or the CLI."""
+
+    def __init__(self):
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Session:
+        with self._lock:
+            stored = self._sessions.get(session_id)
+            if stored is None:
+                return Session()
+            return Session(list(stored.messages), list(stored.display), stored.user_id, stored.version)
+
+    def save(self, session_id: str, session: Session) -> None:
+        with self._lock:
+            stored = self._sessions.get(session_id)
+            if (stored.version if stored else 0) != session.version:
+                raise SessionConflictError(session_id)
+            session.version += 1
+            self._sessions[session_id] = Session(
+                list(session.messages), list(session.display), session.user_id, session.version
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """Store backed by a SQLite file, so sessions survive app restarts."""
+
+    def __init__(self, path: Path = SESSIONS_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn, conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id    TEXT NOT NULL DEFAULT '',
+                    version    INTEGER NOT NULL,
+                    messages   BLOB NOT NULL,
+                    display    BLOB NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self.purge_expired()
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        # One short-lived connection per call keeps the store thread-safe
+        # across Streamlit sessions without sharing a connection.
+        return closing(sqlite3.connect(self.path, timeout=5.0))
+
+    def load(self, session_id: str) -> Session:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT messages, display, user_id, version FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            return Session()
+
+        messages, display, user_id, version = row
+        return Session(messages_from_dict(json.loads(messages)), json.loads(display), user_id, version)
+
+    def save(self, session_id: str, session: Session) -> None:
+        messages = json.dumps(messages_to_dict(session.messages))
+        display = json.dumps(session.display)
+        now = time.time()
+
+        with self._connect() as conn, conn:
+            if session.version == 0:
+                # Also drops an expired row with this id, which ``load`` no longer returns.
+                self._purge(conn, now)
+                cur = conn.execute(
+                    """
+                    INSERT OR IGNORE INTO sessions (session_id, user_id, version, messages, display, updated_at)
+                    VALUES (?, ?, 1, ?, ?, ?)
+                    """,
+                    (session_id, session.user_id, messages, display, now),
+                )
+            else:
+                cur = conn.execute(
+                    """
+                    UPDATE sessions
+                    SET version = version + 1, user_id = ?, messages = ?, display = ?, updated_at = ?
+                    WHERE session_id = ? AND version = ?
+                    """,
+                    (session.user_id, messages, display, now, session_id, session.version),
+                )
+            if cur.rowcount == 0:
+                raise SessionConflictError(session_id)
+
+        session.version += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self) -> None:
+        """Delete every session not saved within ``ttl_seconds``."""
+        with self._connect() as conn, conn:
+            self._purge(conn, time.time())
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,))
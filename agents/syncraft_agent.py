@@ -1,97 +1,115 @@
+import json
+from typing import Iterator
+
 from agents.base import Agent
+from agents.prompts import load_prompt
 
 from tools.syncraft.simulation_setup import add_node, remove_node, move_node, add_edge, remove_edge, reset_graph, get_graph_json
-from tools.syncraft.product_setup import add_product_route, remove_product_route, get_product_routes
+from tools.syncraft.product_setup import add_product_route, add_product_routes, remove_product_route, get_product_routes
+from app.state.graph_state import GRAPH_LOCK, GraphTransaction, current_graph_json
 
-from langchain.messages import AIMessage, HumanMessage
+from langchain.agents.middleware import ModelRequest, wrap_model_call
+from langchain.messages import HumanMessage, ToolMessage
+from langchain_core.messages import BaseMessage
 
 
-class SyncraftAgent(Agent):
-    def __init__(self, model):
-        sys_prompt = """
-            You are an expert in production and manufacturing systems. Your role is to help the user model their
-            production process as a simulation graph made of stations, connections and product routes.
-
-            Goals:
-            - Translate user descriptions into stations, connections and product routes.
-            - Explain and discuss the simulation with the user.
-            - If a request is outside your capabilities, politely decline and explain.
-
-            Tools:
-            - add_node(label, x, y)
-            - remove_node(label)
-            - move_node(label, x_new, y_new)
-            - add_edge(source, target)
-            - remove_edge(source, target)
-            - reset_graph()
-            - get_graph_json()
-            - add_product_route(label, route, color)
-            - remove_product_route(label)
-            - get_product_routes()
-
-            General Workflow Rules:
-            1. Do not rely on internal memory of the simulation graph - instead always inspect the real graph state using get_graph_json() before any actions.
-            2. Based on the actual graph state determine what changes need to be made conceptually to conform with a user request.
-            3. Determine a list of actions/tool calls that need to be performed.
-            4. Call only the tool(s) needed to perform that change
-            5. If a tool returns {"ok": false, "error": "..."} you MUST correct the issue and retry the tool call.
-            6. Never make changes to unrelated parts of the graph
-            7. Never ask for clarifications unless the user request is ambiguous. Do not ask about layout, spacing, naming, or defaults unless the user explicitly states they want a choice.
-            8. Use consistent station names. Internal IDs are case sensitive. When in doubt about a name ask the user for clarification to avoid duplicate stations.
-            8. Verify that the intended change was successfully implemented.
-
-            Layout Rules:
-            - The graph is plotted on a fixed 2D plotly graph with coordinates (0,0) at the bottom left corner.
-            - Always preserve any user defined positions.
-            - Reposition nodes one if:
-                - The user requests it
-                - Nodes are clearly overlapping, intersecting or otherwise misaligned.
-            - When inferring new coordinates:
-                - Prefer left → right progression
-                - Keep nodes at y-level similar to neighbors
-                - Maintain consistent spacing
-
-            Output Rules:
-            - Use production terms instead of internal terminology ("simulation" instead of "graph", "stations" instead of "nodes", "connections" instead of "edges", etc.)
-            - Do not mention internal implementation details (NetworkX, node IDs, JSON, etc.) unless the user explicitly asks.
-            - When modifying the graph, describe the actions and any changes conceptually (e.g., “Added a station…”) rather than mentioning underlying mechanics.
-            """
+# Identical for every instance, so the tool list is built once at import.
+TOOLS = (
+    add_node,
+    remove_node,
+    move_node,
+    add_edge,
+    remove_edge,
+    reset_graph,
+    get_graph_json,
+    add_product_route,
+    add_product_routes,
+    remove_product_route,
+    get_product_routes,
+)
+
+# Tools that only read the state; the agent may run these side by side.
+READ_ONLY_TOOLS = (get_graph_json.name, get_product_routes.name)
+
+# Larger graphs are left to the get_graph_json() tool to keep every request small.
+INLINE_GRAPH_MAX_CHARS = 20_000
+
+
+def _with_cache_control(message: BaseMessage, cache_control: dict) -> BaseMessage:
+    """Copy of ``message`` with a prompt cache breakpoint on its last content block."""
+    if isinstance(message, ToolMessage):
+        # Anthropic sends tool results as blocks of a user message; mark that block.
+        block = {
+            "type": "tool_result",
+            "content": message.content,
+            "tool_use_id": message.tool_call_id,
+            "is_error": message.status == "error",
+            "cache_control": cache_control,
+        }
+        return message.model_copy(update={"content": [block]})
+
+    content = message.content
+    blocks = [{"type": "text", "text": content}] if isinstance(content, str) else list(content)
+    last = blocks[-1]
+    if isinstance(last, str):
+        last = {"type": "text", "text": last}
+    blocks[-1] = {**last, "cache_control": cache_control}
+    return message.model_copy(update={"content": blocks})
+
+
+@wrap_model_call
+def inline_graph_state(request: ModelRequest, handler):
+    """
+    Append the current graph after the conversation before every model call,
+    saving the get_graph_json() round trip.
 
+    The state is sent as a trailing user block behind the prompt cache
+    breakpoint that ``AnthropicPromptCachingMiddleware`` asked for, so a graph
+    change only re-sends the state itself; the system prompt and the history
+    stay cached. The block is part of the request only, not of the thread.
+    """
+    with GRAPH_LOCK:
+        graph_json = json.dumps(current_graph_json(), separators=(",", ":"))
+    if len(graph_json) > INLINE_GRAPH_MAX_CHARS or not request.messages:
+        return handler(request)
 
+    messages = list(request.messages)
+    model_settings = dict(request.model_settings)
+    cache_control = model_settings.pop("cache_control", None)
+    if cache_control is not None:
+        # ChatAnthropic would put the breakpoint on the state block, the last one.
+        messages[-1] = _with_cache_control(messages[-1], cache_control)
+
+    state_block = {"type": "text", "text": f"Current simulation state (graph JSON):\n{graph_json}"}
+    messages.append(HumanMessage(content=[state_block]))
+    return handler(request.override(messages=messages, model_settings=model_settings))
+
+
+class SyncraftAgent(Agent):
+    def __init__(self, model):
         super().__init__(
             role="Graph Simulation Setup Assistant",
             version="1.0",
-            sys_prompt=sys_prompt,
-            tools=[add_node, 
-                remove_node, 
-                move_node, 
-                add_edge, 
-                remove_edge, 
-                reset_graph, 
-                get_graph_json,
-                add_product_route,
-                remove_product_route,
-                get_product_routes
-            ],
-            model=model
+            sys_prompt=load_prompt("syncraft"),
+            tools=TOOLS,
+            model=model,
+            middleware=[inline_graph_state],
+            read_only_tools=READ_ONLY_TOOLS,
         )
     
-    def go_to_work(self, user_instructions: str) -> str: # type: ignore
+    def go_to_work(self, user_instructions: str, thread_id: str) -> str: # type: ignore
 
         user_msg = HumanMessage(content=user_instructions)
-        result = self.invoke(user_msg=user_msg)
-
-        # Extract final AI message
-        messages = result.get("messages", [])
-        final_msg = None
-
-        if messages and isinstance(messages[-1], AIMessage):
-            final_msg = messages[-1].content
-        else:
-            # fallback: find last AIMessage
-            for msg in reversed(messages):
-                if isinstance(msg, AIMessage):
-                    final_msg = msg.content
-                    break
-
-        return final_msg # type: ignore
\ No newline at end of file
+
+        # Tools mutate one shared in-memory graph; graph.json is written once per turn.
+        with GraphTransaction():
+            result = self.invoke(user_msg=user_msg, thread_id=thread_id)
+
+        return self.final_reply(result) # type: ignore
+
+    def stream_work(self, user_instructions: str, thread_id: str) -> Iterator[str]:
+        """Like ``go_to_work``, but yields the reply text as it is generated."""
+        user_msg = HumanMessage(content=user_instructions)
+
+        with GraphTransaction():
+            yield from self.stream(user_msg=user_msg, thread_id=thread_id)
\ No newline at end of file
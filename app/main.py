@@ -1,4 +1,5 @@
 import sys
+import uuid
 from pathlib import Path
 
 root = Path(__file__).resolve().parents[1]
@@ -6,19 +7,59 @@ if str(root) not in sys.path:
     sys.path.insert(0, str(root))
 
 
+import orjson
 import streamlit as st
-from app.state.graph_state import load_graph
-from app.state.product_state import load_products
+from app.state.graph_state import graph_file_stamp, graph_from_json, graph_to_json, load_graph
+from app.state.product_state import load_products, products_file_stamp
 from ui.plotly_graph import build_graph_figure
     
 from agents.agent_connector import (
     get_display_history,
     new_session_id,
     reset_session,
-    send_message,
+    resume_session,
+    stream_message,
 )
 
 
+# cache_resource hands back the memoised Figure itself: cache_data would
+# pickle it, and unpickling re-runs plotly's validation, costing about as
+# much as a rebuild. st.plotly_chart only reads the figure, so sharing is safe.
+@st.cache_resource(show_spinner=False, max_entries=32)
+def build_cached_fig(graph_json_str: str, products_json_str: str, n_steps: int):
+    """Rebuild the figure only when the graph or products actually changed."""
+    return build_graph_figure(
+        graph=graph_from_json(orjson.loads(graph_json_str)),
+        products=orjson.loads(products_json_str),
+        n_steps=n_steps,
+    )
+
+
+def refresh_state(force: bool = False) -> None:
+    """
+    Mirror graph.json / products.json into session_state, skipping files that
+    were not modified since the last refresh (e.g. after a purely conversational turn).
+    """
+    graph_stamp = graph_file_stamp()
+    if force or graph_stamp != st.session_state.get("last_graph_stamp"):
+        st.session_state.graph = load_graph()
+        st.session_state.last_graph_stamp = graph_stamp
+
+    products_stamp = products_file_stamp()
+    if force or products_stamp != st.session_state.get("last_products_stamp"):
+        st.session_state.products = load_products()
+        st.session_state.last_products_stamp = products_stamp
+
+
+def _session_from_url() -> str | None:
+    """Session id from the ``?session=`` query parameter, if it is a valid one."""
+    session_id = st.query_params.get("session")
+    try:
+        return str(uuid.UUID(session_id)) if session_id else None
+    except ValueError:
+        return None
+
+
 def main():
     # Page config
     st.set_page_config(page_title="Syncraft Chat", page_icon="💬", layout="wide")
@@ -30,32 +71,39 @@ def main():
         # Return a valid avatar target; Streamlit accepts emoji, URL, or local path.
         return str(path) if path and path.exists() else fallback
 
+    # Resolved once per run rather than once per rendered message.
+    bot_avatar_src = resolve_avatar(bot_avatar, "🤖")
+    user_avatar_src = resolve_avatar(user_avatar, "💬")
+
     # Session bootstrap
+    # The session id lives in the URL, so reloading the page resumes the session.
+    new_session = False
     if "session_id" not in st.session_state:
-        st.session_state.session_id = new_session_id()
+        session_id = _session_from_url()
+        new_session = session_id is None
+        if new_session:
+            session_id = new_session_id()
+            st.query_params["session"] = session_id
+        st.session_state.session_id = session_id
     if "messages" not in st.session_state:
-        st.session_state.messages = get_display_history(st.session_state.session_id)
-        if not st.session_state.messages:
-            st.session_state.messages = [
-                {"role": "assistant", "content": "Hi! Ask me to setup a production simulation."}
-            ]
+        # A freshly generated session id cannot have stored history yet.
+        history = [] if new_session else resume_session(st.session_state.session_id)
+        st.session_state.messages = history or [
+            {"role": "assistant", "content": "Hi! Ask me to setup a production simulation."}
+        ]
     # Mirror global graph
-    if "graph" not in st.session_state:
-        st.session_state.graph = load_graph()
-
-    if "products" not in st.session_state:
-        st.session_state.products = load_products()
+    if "graph" not in st.session_state or "products" not in st.session_state:
+        refresh_state(force=True)
 
     # Title
     st.title("Syncraft")
 
     # Render chat history
     st.caption("Your agentic production simulation assistant.")
+    # Streamlit drops elements not re-issued on a rerun, so the full history
+    # has to be rendered every time; keep the per-message work minimal.
     for msg in st.session_state.messages:
-        avatar = resolve_avatar(
-            bot_avatar if msg["role"] == "assistant" else user_avatar,
-            "🤖" if msg["role"] == "assistant" else "💬",
-        )
+        avatar = bot_avatar_src if msg["role"] == "assistant" else user_avatar_src
         with st.chat_message(msg["role"], avatar=avatar):
             st.markdown(msg["content"])
 
@@ -75,21 +123,19 @@ def main():
             st.warning("Please enter a message.")
             st.stop()
 
-        with st.chat_message("user", avatar=resolve_avatar(user_avatar, "💬")):
+        with st.chat_message("user", avatar=user_avatar_src):
             st.markdown(user_input)
 
-        response, updated_history = send_message(
-            session_id=st.session_state.session_id, user_message=user_input
-        )
-
-        with st.chat_message("assistant", avatar=resolve_avatar(bot_avatar, "🤖")):
-            st.markdown(response)
+        # Show the reply token by token while the agent works.
+        with st.chat_message("assistant", avatar=bot_avatar_src):
+            st.write_stream(
+                stream_message(session_id=st.session_state.session_id, user_message=user_input)
+            )
 
 
         # Update UI adter agent calls
-        st.session_state.messages = updated_history
-        st.session_state.graph = load_graph()
-        st.session_state.products = load_products()
+        st.session_state.messages = get_display_history(st.session_state.session_id)
+        refresh_state()
         print(st.session_state.graph)
 
 
@@ -103,12 +149,12 @@ def main():
             reset_session(st.session_state.session_id)
             # Clear all session state variables
             st.session_state.session_id = new_session_id()
+            st.query_params["session"] = st.session_state.session_id
             st.session_state.messages = [
                 {"role": "assistant", "content": "Hi! Ask me to setup a production simulation."}
             ]
             # Force fresh load from disk
-            st.session_state.graph = load_graph()
-            st.session_state.products = load_products()
+            refresh_state(force=True)
             # Trigger re-render by marking state as modified
             st.session_state.reset_triggered = True
 
@@ -129,9 +175,9 @@ def main():
     # Plotly graph
     st.divider()
 
-    fig = build_graph_figure(
-        graph=st.session_state.graph,
-        products=st.session_state.products,
+    fig = build_cached_fig(
+        graph_json_str=orjson.dumps(graph_to_json(st.session_state.graph)).decode(),
+        products_json_str=orjson.dumps(st.session_state.products).decode(),
         n_steps=50,
     )
 
@@ -1,81 +1,196 @@
 from __future__ import annotations
 
+from contextvars import ContextVar
 from pathlib import Path
-import json
+import hashlib
+import os
 import tempfile
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, Optional, Tuple, TypedDict
 
-import networkx as nx
-from networkx.readwrite import json_graph
+import orjson
 
 
 _STATE_DIR = Path(__file__).resolve().parent
 GRAPH_PATH = _STATE_DIR / "graph.json"
 
 
-def load_graph() -> nx.DiGraph:
+class Graph(TypedDict):
     """
-    Load a directed graph from ``graph.json`` stored in adjacency format.
-    If the file does not exist, is empty, or is temporarily corrupted,
-    an empty DiGraph is returned.
+    Directed graph as plain dicts:
+      - ``nodes``: node id -> attributes (``pos``, ``color``, ``process_time``, ...)
+      - ``edges``: ``(source, target)`` -> attributes (``label``, ``color``)
     """
-    if not GRAPH_PATH.exists() or GRAPH_PATH.stat().st_size == 0:
-        return nx.DiGraph()
+    nodes: Dict[str, Dict[str, Any]]
+    edges: Dict[Tuple[str, str], Dict[str, Any]]
+
+
+def new_graph() -> Graph:
+    return {"nodes": {}, "edges": {}}
+
+
+def copy_graph(graph: Graph) -> Graph:
+    return {
+        "nodes": {n: dict(attrs) for n, attrs in graph["nodes"].items()},
+        "edges": {e: dict(attrs) for e, attrs in graph["edges"].items()},
+    }
+
+
+def graph_from_json(data: Dict[str, Any]) -> Graph:
+    """Build a ``Graph`` from node-link JSON (the format of ``graph.json``)."""
+    # The schema is fixed, so copy each record once and pop the id keys
+    # instead of filtering every attribute.
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for n in data.get("nodes", []):
+        attrs = n.copy()
+        nodes[attrs.pop("id")] = attrs
+
+    edges: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for e in data.get("edges", []):
+        attrs = e.copy()
+        edges[(attrs.pop("source"), attrs.pop("target"))] = attrs
+
+    return {"nodes": nodes, "edges": edges}
+
+
+def graph_to_json(graph: Graph) -> Dict[str, Any]:
+    """Inverse of ``graph_from_json``; matches networkx's node-link layout."""
+    return {
+        "directed": True,
+        "multigraph": False,
+        "graph": {},
+        "nodes": [{**attrs, "id": n} for n, attrs in graph["nodes"].items()],
+        "edges": [{**attrs, "source": u, "target": v} for (u, v), attrs in graph["edges"].items()],
+    }
+
+
+# Parsed contents of ``graph.json``, valid while the file's stat stamp is unchanged.
+# Streamlit reruns and parallel tool calls share it, hence the lock.
+_cache: Dict[str, Any] = {"stamp": None, "json": None, "graph": None, "digest": None, "sorted_nodes": None}
+_cache_lock = threading.Lock()
+
+# Held by tools around load -> mutate -> save so that tool calls executed in
+# parallel within one agent turn do not overwrite each other's changes.
+GRAPH_LOCK = threading.RLock()
+
 
+def graph_file_stamp() -> Optional[Tuple[int, int, int]]:
+    """``(mtime_ns, inode, size)`` of ``graph.json``, or None if it is missing."""
+    # save_graph replaces the file, so the inode changes on every write even
+    # if two writes land within the same mtime tick.
     try:
-        with GRAPH_PATH.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        # If we ever catch a partially written / corrupted file, avoid
-        # crashing the UI or tools and return an empty graph instead.
-        return nx.DiGraph()
+        st = GRAPH_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
 
-    graph = json_graph.node_link_graph(data)
-    return graph
+
+def _digest(raw: bytes) -> bytes:
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def _load_cached() -> Tuple[Dict[str, Any], Optional[Graph]]:
+    """
+    Return ``(raw_json, graph)`` for the current file contents, re-reading
+    the file only if it changed since the last load or save.
+    """
+    with _cache_lock:
+        stamp = graph_file_stamp()
+        if stamp is not None and stamp == _cache["stamp"]:
+            return _cache["json"], _cache["graph"]
+
+        if stamp is None or stamp[2] == 0:
+            return {}, None
+
+        try:
+            raw = GRAPH_PATH.read_bytes()
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # If we ever catch a partially written / corrupted file, avoid
+            # crashing the UI or tools and return an empty graph instead.
+            return {}, None
+
+        graph = graph_from_json(data)
+        _cache.update(stamp=stamp, json=data, graph=graph, digest=_digest(raw), sorted_nodes=None)
+        return data, graph
+
+
+def load_graph() -> Graph:
+    """
+    Load a directed graph from ``graph.json`` stored in node-link format.
+    If the file does not exist, is empty, or is temporarily corrupted,
+    an empty graph is returned.
+
+    The graph is cached until the file changes; callers get their own copy
+    and may mutate it freely.
+    """
+    _, graph = _load_cached()
+    if graph is None:
+        return new_graph()
+    return copy_graph(graph)
 
 
 def load_graph_json() -> Dict[str, Any]:
     """
     Return the raw JSON structure stored in ``graph.json``.
     If the file is missing, empty, or invalid, an empty dict is returned.
+
+    The returned dict is shared with the cache and must not be mutated.
     """
-    if not GRAPH_PATH.exists() or GRAPH_PATH.stat().st_size == 0:
-        return {}
+    data, _ = _load_cached()
+    return data
 
-    try:
-        with GRAPH_PATH.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        return {}
 
-    return data
+def load_graph_nodes_sorted() -> Tuple[str, ...]:
+    """
+    Sorted node IDs of the graph in ``graph.json``.
+    Cached until the file is reloaded or saved.
+    """
+    _, graph = _load_cached()
+    with _cache_lock:
+        if graph is not _cache["graph"]:  # reloaded or saved concurrently
+            return tuple(sorted(graph["nodes"])) if graph else ()
+        if _cache["sorted_nodes"] is None:
+            _cache["sorted_nodes"] = tuple(sorted(graph["nodes"])) if graph else ()
+        return _cache["sorted_nodes"]
 
 
-def save_graph(graph: nx.DiGraph) -> None:
+def save_graph(graph: Graph) -> None:
     """
-    Persist the given directed graph to ``graph.json`` in adjacency format.
+    Persist the given directed graph to ``graph.json`` in node-link format.
 
     The write is done atomically via a temporary file, so readers will
     either see the old complete file or the new complete file, never a
     half-written JSON blob.
     """
     GRAPH_PATH.parent.mkdir(parents=True, exist_ok=True)
-    data = json_graph.node_link_data(graph)
+    data = graph_to_json(graph)
+    # Compact JSON; the file is only ever read by code.
+    raw = orjson.dumps(data)
+    digest = _digest(raw)
+
+    # Skip the write entirely if graph.json already holds exactly these bytes.
+    with _cache_lock:
+        if digest == _cache["digest"] and graph_file_stamp() == _cache["stamp"]:
+            return
 
     # Use a unique temporary file per call to avoid collisions when multiple
     # tool invocations save concurrently.
     with tempfile.NamedTemporaryFile(
-        "w",
-        encoding="utf-8",
+        "wb",
         dir=GRAPH_PATH.parent,
         delete=False,
         suffix=".tmp",
     ) as f:
-        json.dump(data, f, indent=2)
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
         tmp_name = f.name
 
     # Atomic replacement on POSIX (macOS, Linux).
-    Path(tmp_name).replace(GRAPH_PATH)
+    with _cache_lock:
+        os.replace(tmp_name, GRAPH_PATH)
+        _cache.update(stamp=graph_file_stamp(), json=data, graph=copy_graph(graph), digest=digest, sorted_nodes=None)
 
 
 def reset_graph_state() -> None:
@@ -83,7 +198,114 @@ def reset_graph_state() -> None:
     Reset the shared graph to an empty directed graph.
 
     This is a convenience wrapper around save_graph for the common case of
-    clearing the graph entirely.
+    clearing the graph entirely. Inside a ``GraphTransaction`` the
+    transaction's graph is cleared instead.
+    """
+    tx = _active_transaction.get()
+    if tx is not None:
+        tx.graph["nodes"].clear()
+        tx.graph["edges"].clear()
+        tx.dirty = True
+        tx.sorted_nodes = None
+        return
+
+    save_graph(new_graph())
+
+
+def rebase_graph(base: Graph, ours: Graph, theirs: Graph) -> Graph:
+    """
+    Apply the changes from ``base`` to ``ours`` on top of ``theirs``.
+    Nodes and edges changed on both sides take ``ours``; edges left without
+    one of their stations are dropped.
+    """
+    merged = copy_graph(theirs)
+    for key in ("nodes", "edges"):
+        for item in base[key].keys() - ours[key].keys():
+            merged[key].pop(item, None)
+        for item, attrs in ours[key].items():
+            if base[key].get(item) != attrs:
+                merged[key][item] = dict(attrs)
+
+    nodes = merged["nodes"]
+    merged["edges"] = {(u, v): attrs for (u, v), attrs in merged["edges"].items() if u in nodes and v in nodes}
+    return merged
+
+
+class GraphTransaction:
     """
-    graph = nx.DiGraph()
-    save_graph(graph)
\ No newline at end of file
+    Share one in-memory graph between all tool calls of an agent turn.
+
+    On enter the graph is loaded once; tools obtain it via ``current_graph``
+    and report changes via ``commit_graph``. On exit the graph is saved once,
+    and only if something changed. If ``graph.json`` was written meanwhile
+    (another session's turn, "Reset chat"), only this turn's changes are
+    applied on top of it, see ``rebase_graph``. Tool calls outside a
+    transaction keep loading and saving ``graph.json`` directly.
+    """
+
+    def __init__(self):
+        self.graph: Graph | None = None
+        self.dirty = False
+        self.sorted_nodes: Tuple[str, ...] | None = None
+        self._base: Graph | None = None
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._token = None
+
+    def __enter__(self) -> "GraphTransaction":
+        # Stamp before loading: a write in between then counts as a change.
+        self._stamp = graph_file_stamp()
+        self.graph = load_graph()
+        self._base = copy_graph(self.graph)
+        self.dirty = False
+        self._token = _active_transaction.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _active_transaction.reset(self._token)
+        # Persist even if the turn failed half-way; the changes made so far
+        # would have been on disk already without the transaction.
+        if not self.dirty:
+            return
+        with GRAPH_LOCK:
+            if graph_file_stamp() != self._stamp:
+                self.graph = rebase_graph(self._base, self.graph, load_graph())
+            save_graph(self.graph)
+
+
+_active_transaction: ContextVar[GraphTransaction | None] = ContextVar("graph_transaction", default=None)
+
+
+def current_graph() -> Graph:
+    """Return the active transaction's graph, or a freshly loaded one."""
+    tx = _active_transaction.get()
+    if tx is not None:
+        return tx.graph
+    return load_graph()
+
+
+def commit_graph(graph: Graph) -> None:
+    """Mark the transaction's graph as changed, or save ``graph`` right away."""
+    tx = _active_transaction.get()
+    if tx is not None and graph is tx.graph:
+        tx.dirty = True
+        tx.sorted_nodes = None
+    else:
+        save_graph(graph)
+
+
+def current_graph_json() -> Dict[str, Any]:
+    """Like ``load_graph_json``, but reflects uncommitted transaction changes."""
+    tx = _active_transaction.get()
+    if tx is not None:
+        return graph_to_json(tx.graph)
+    return load_graph_json()
+
+
+def current_graph_nodes_sorted() -> Tuple[str, ...]:
+    """Like ``load_graph_nodes_sorted``, but for ``current_graph()``."""
+    tx = _active_transaction.get()
+    if tx is None:
+        return load_graph_nodes_sorted()
+    if tx.sorted_nodes is None:
+        tx.sorted_nodes = tuple(sorted(tx.graph["nodes"]))
+    return tx.sorted_nodes
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
 from pathlib import Path
-import json
+import hashlib
+import os
 import tempfile
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 
 _STATE_DIR = Path(__file__).resolve().parent
 PRODUCTS_PATH = _STATE_DIR / "products.json"
 
+# Held by tools around load -> mutate -> save, see ``graph_state.GRAPH_LOCK``.
+PRODUCTS_LOCK = threading.RLock()
+
+# Stat stamp and digest of the last ``products.json`` written by this process.
+_last_write: Dict[str, Any] = {"stamp": None, "digest": None}
+_write_lock = threading.Lock()
+
+
+def products_file_stamp() -> Optional[Tuple[int, int, int]]:
+    """``(mtime_ns, inode, size)`` of ``products.json``, see ``graph_state.graph_file_stamp``."""
+    try:
+        st = PRODUCTS_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
 
 def load_products() -> List[Dict[str, Any]]:
     """
@@ -25,9 +45,8 @@ def load_products() -> List[Dict[str, Any]]:
         return []
 
     try:
-        with PRODUCTS_PATH.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
+        data = orjson.loads(PRODUCTS_PATH.read_bytes())
+    except orjson.JSONDecodeError:
         return []
 
     # Ensure we always return a list of dicts.
@@ -46,18 +65,29 @@ def save_products(products: List[Dict[str, Any]]) -> None:
     half-written JSON blob.
     """
     PRODUCTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Compact JSON; the file is only ever read by code.
+    raw = orjson.dumps(products)
+    digest = hashlib.blake2b(raw, digest_size=16).digest()
+
+    # Skip the write if products.json is still exactly what we last wrote.
+    with _write_lock:
+        if digest == _last_write["digest"] and products_file_stamp() == _last_write["stamp"]:
+            return
 
     with tempfile.NamedTemporaryFile(
-        "w",
-        encoding="utf-8",
+        "wb",
         dir=PRODUCTS_PATH.parent,
         delete=False,
         suffix=".tmp",
     ) as f:
-        json.dump(products, f, indent=2)
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
         tmp_name = f.name
 
-    Path(tmp_name).replace(PRODUCTS_PATH)
+    with _write_lock:
+        os.replace(tmp_name, PRODUCTS_PATH)
+        _last_write.update(stamp=products_file_stamp(), digest=digest)
 
 
 def reset_products() -> None:
@@ -1,10 +1,24 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+import numpy as np
 import plotly.graph_objects as go
-import networkx as nx
+
+from app.state.graph_state import Graph
+
+# More frames per route segment than this are not visibly smoother.
+MAX_STEPS_PER_SEGMENT = 25
+
+
+def _fmt_time(minutes: float | None) -> str:
+    """Format a duration in minutes as mm:ss, or "N/A"."""
+    if minutes is None:
+        return "N/A"
+    mins, secs = divmod(int(minutes * 60), 60)
+    return f"{mins:02d}:{secs:02d}"
+
 
 def build_graph_figure(
-    graph: nx.DiGraph,
+    graph: Graph,
     products: List[Dict[str, Any]] | None = None,
     n_steps: int = 50,
     frame_duration_ms: int = 50,
@@ -15,11 +29,13 @@ def build_graph_figure(
     Build a Plotly figure for a graph with optional animated products.
 
     Args:
-        graph: ``nx.DiGraph`` with nodes having ``'pos': (x, y)``.
+        graph: ``Graph`` with nodes having ``'pos': (x, y)``.
         products: Optional list of dicts, each with keys:
             - "route": List[str], node IDs along the path
             - "color": str, CSS color
-        n_steps: Number of interpolation steps / frames for the animation.
+            Single-station routes are drawn as static markers.
+        n_steps: Number of interpolation steps / frames for the animation,
+            capped at ``MAX_STEPS_PER_SEGMENT`` per segment of the longest route.
         frame_duration_ms: Playback speed; duration of each frame in ms.
         show_slider: Whether to show a frame slider under the plot.
         loop: Whether the Play button should loop the animation.
@@ -28,19 +44,25 @@ def build_graph_figure(
         A configured ``go.Figure``.
     """
     # Node positions
-    pos = {node: data["pos"] for node, data in graph.nodes(data=True)}
+    pos = {node: data["pos"] for node, data in graph["nodes"].items()}
 
     # --- Base figure ---
     fig = go.Figure()
 
     # --- Static edges ---
-    for u, v, data in graph.edges(data=True):
+    # One trace per edge colour, with segments separated by None.
+    edge_groups: Dict[str, Tuple[list, list]] = {}
+    for (u, v), data in graph["edges"].items():
         x0, y0 = pos[u]
         x1, y1 = pos[v]
-        color = data.get("color", "gray")
+        edge_x, edge_y = edge_groups.setdefault(data.get("color", "gray"), ([], []))
+        edge_x.extend((x0, x1, None))
+        edge_y.extend((y0, y1, None))
+
+    for color, (edge_x, edge_y) in edge_groups.items():
         fig.add_trace(go.Scatter(
-            x=[x0, x1],
-            y=[y0, y1],
+            x=edge_x,
+            y=edge_y,
             mode="lines",
             line=dict(color=color, width=3),
             hoverinfo="skip",
@@ -50,23 +72,12 @@ def build_graph_figure(
     # --- Static nodes ---
     # Build hover text with node details
     node_ids = list(pos.keys())
-    hover_texts = []
-    for node_id in node_ids:
-        node_data = graph.nodes[node_id]
-        process_time_raw = node_data.get("process_time")
-        capacity = node_data.get("capacity", "N/A")
-        
-        # Convert process_time from minutes (float) to mm:ss format
-        if process_time_raw is not None:
-            minutes = int(process_time_raw)
-            seconds = int((process_time_raw - minutes) * 60)
-            process_time = f"{minutes:02d}:{seconds:02d}"
-        else:
-            process_time = "N/A"
-        
-        hover_text = f"{node_id}<br>Process Time: {process_time}<br>Capacity: {capacity}"
-        hover_texts.append(hover_text)
-    
+    hover_texts = [
+        f"{node_id}<br>Process Time: {_fmt_time(data.get('process_time'))}"
+        f"<br>Capacity: {data.get('capacity', 'N/A')}"
+        for node_id, data in graph["nodes"].items()
+    ]
+
     fig.add_trace(go.Scatter(
         x=[p[0] for p in pos.values()],
         y=[p[1] for p in pos.values()],
@@ -81,78 +92,107 @@ def build_graph_figure(
 
 
     # --- Animation frames (moving products only) ---
-    # Normalise products to a list and filter out invalid routes.
-    raw_products = products or []
+    # Normalise products to a list and filter out invalid routes, including
+    # routes through stations that have since been removed.
+    raw_products = [
+        p for p in products or []
+        if all(station in pos for station in p.get("route", []))
+    ]
     valid_products = [
         p for p in raw_products
         if len(p.get("route", [])) >= 2
     ]
-    if valid_products:
-        # Add one scatter trace per product so frames can update them by index.
-        product_trace_indices: List[int] = []
-        for product in valid_products:
-            route = product["route"]
-            color = product.get("color", "red")
-            start_node = route[0]
-            x0, y0 = pos[start_node]
-
-            fig.add_trace(
-                go.Scatter(
-                    x=[x0],
-                    y=[y0],
-                    mode="markers",
-                    marker=dict(size=18, color=color),
-                    hoverinfo="skip",
-                    showlegend=False,
-                )
-            )
-            product_trace_indices.append(len(fig.data) - 1)
-
-        # Build animation frames that update only the product traces.
-        frames: List[go.Frame] = []
-        for step in range(n_steps + 1):
-            t = step / n_steps
-            frame_traces = []
 
-            for product in valid_products:
-                route = product["route"]
-
-                seg_count = len(route) - 1
-                seg_float = t * seg_count
-                seg_idx = int(seg_float)
-                local_t = seg_float - seg_idx
-                if seg_idx >= seg_count:
-                    seg_idx = seg_count - 1
-                    local_t = 1.0
+    # Single-station products never move: draw them once, outside the frames.
+    static_products = [p for p in raw_products if len(p.get("route", [])) == 1]
+    if static_products:
+        fig.add_trace(
+            go.Scatter(
+                x=[pos[p["route"][0]][0] for p in static_products],
+                y=[pos[p["route"][0]][1] for p in static_products],
+                mode="markers",
+                marker=dict(size=18, color=[p.get("color", "red") for p in static_products]),
+                hoverinfo="skip",
+                showlegend=False,
+            )
+        )
 
-                src, dst = route[seg_idx], route[seg_idx + 1]
-                x0, y0 = pos[src]
-                x1, y1 = pos[dst]
+    if valid_products:
+        # Products on the same route are always at the same position, so each
+        # distinct route is interpolated once and mapped back per product.
+        routes = [tuple(p["route"]) for p in valid_products]
+        unique_routes = {route: None for route in routes}
+        route_index = {route: i for i, route in enumerate(unique_routes)}
+        product_route = np.array([route_index[route] for route in routes])
+
+        # Interpolate all routes on all frames at once.
+        # route_xy: (R, max_route_len, 2) station coordinates, zero padded.
+        seg_counts = np.array([len(route) - 1 for route in unique_routes])
+        route_xy = np.zeros((len(unique_routes), seg_counts.max() + 1, 2))
+        for i, route in enumerate(unique_routes):
+            route_xy[i, : seg_counts[i] + 1] = [pos[n] for n in route]
+
+        # Cap the frame count for short routes, keeping the playback duration.
+        max_steps = MAX_STEPS_PER_SEGMENT * int(seg_counts.max())
+        if n_steps > max_steps:
+            frame_duration_ms = frame_duration_ms * n_steps // max_steps
+            n_steps = max_steps
+
+        # All products share one scatter trace with per-point colours, so each
+        # frame only updates a single trace.
+        start_x, start_y = route_xy[product_route, 0].T.tolist()
+        fig.add_trace(
+            go.Scatter(
+                x=start_x,
+                y=start_y,
+                mode="markers",
+                marker=dict(size=18, color=[p.get("color", "red") for p in valid_products]),
+                hoverinfo="skip",
+                showlegend=False,
+            )
+        )
+        product_trace_indices = [len(fig.data) - 1]
 
-                x = x0 * (1 - local_t) + x1 * local_t
-                y = y0 * (1 - local_t) + y1 * local_t
+        # (T, R): segment index and position within it for every frame/route.
+        # At t=1 this clamps to the end of the last segment.
+        ts = np.linspace(0.0, 1.0, n_steps + 1)
+        seg_float = ts[:, None] * seg_counts[None, :]
+        seg_idx = np.minimum(seg_float.astype(np.int64), seg_counts - 1)
+        local_t = (seg_float - seg_idx)[..., None]
 
-                # Only need x/y updates; marker style can be inherited.
-                frame_traces.append(go.Scatter(x=[x], y=[y]))
+        route_idx = np.arange(len(unique_routes))[None, :]
+        src = route_xy[route_idx, seg_idx]
+        dst = route_xy[route_idx, seg_idx + 1]
+        xy = (src * (1 - local_t) + dst * local_t)[:, product_route]  # (T, P, 2)
 
+        # Build animation frames that update only the product traces.
+        # Plain dicts skip plotly's per-object validation, which dominates
+        # build time with many frames.
+        frames: List[Dict[str, Any]] = []
+        frame_names: List[str] = []
+        for step, (step_x, step_y) in enumerate(xy.transpose(0, 2, 1).tolist()):
+            name = str(step)
+            frame_names.append(name)
             frames.append(
-                go.Frame(
-                    data=frame_traces,
-                    traces=product_trace_indices,
-                    name=str(step),
-                )
+                {
+                    # Only need x/y updates; marker style can be inherited.
+                    "data": [{"type": "scatter", "x": step_x, "y": step_y}],
+                    "traces": product_trace_indices,
+                    "name": name,
+                }
             )
 
         fig.frames = frames
 
         # --- Play / Loop controls inside the figure ---
-        # Approximate looping by repeating the frame sequence several times.
-        frame_names = [str(i) for i in range(len(frames))]
+        # plotly.js cannot loop forever, so looping repeats the frame sequence
+        # several times. Otherwise ``None`` plays all frames once, and
+        # fromcurrent resumes after a stop instead of restarting.
         loop_cycles = 5  # visual looping; not truly infinite
-        loop_sequence = frame_names * loop_cycles
+        play_frames = frame_names * loop_cycles if loop else None
         loop_args: Dict[str, Any] = {
             "frame": {"duration": frame_duration_ms, "redraw": True},
-            "fromcurrent": False,
+            "fromcurrent": not loop,
             "transition": {"duration": 0},
             "mode": "immediate",
         }
@@ -161,7 +201,7 @@ def build_graph_figure(
             dict(
                 label="▶",
                 method="animate",
-                args=[loop_sequence, loop_args],
+                args=[play_frames, loop_args],
             ),
             dict(
                 label="⏹",
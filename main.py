@@ -1,4 +1,9 @@
-from agents.agent_connector import new_session_id, reset_session, send_message
+import sys
+
+from agents.agent_connector import new_session_id, reset_session, stream_message
+
+
+_EXIT_COMMANDS = frozenset({"exit", "quit", "q"})
 
 
 def main():
@@ -7,15 +12,25 @@ def main():
     print("Interactive mode. Type 'exit' or 'quit' to stop.\n")
     while True:
         user_input = input("You: ").strip()
-        if user_input.lower() in {"exit", "quit", "q"}:
+        if user_input.lower() in _EXIT_COMMANDS:
             print("Goodbye!")
             reset_session(session_id)
             break
 
-        output, _ = send_message(session_id=session_id, user_message=user_input)
-
-        print(f"Agent: {output}\n")
+        # Write the reply as it streams in rather than formatting it at the end.
+        # The prefix goes out with the first chunk, after anything printed
+        # while the turn was starting (e.g. tool calls).
+        write = sys.stdout.write
+        prefix = "Agent: "
+        for chunk in stream_message(session_id=session_id, user_message=user_input):
+            if prefix:
+                write(prefix)
+                prefix = ""
+            write(chunk)
+            sys.stdout.flush()
+        write(prefix + "\n\n")  # prefix is still pending if the reply was empty
+        sys.stdout.flush()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,33 @@
+"""
+Ahead-of-time build of the inventory simulation kernel.
+
+    python -m tools.simpy.build_kernel
+
+writes the ``inventory_kernel`` extension next to this file. ``inventory_control``
+imports it when present and otherwise JIT-compiles ``kernel.simulate``.
+
+``numba.pycc`` is deprecated upstream but still ships with the pinned numba;
+if it goes away, drop this script and rely on the cached JIT build.
+"""
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+from tools.simpy.kernel import simulate
+
+
+# (s, S, days, demands, lead_times, holding_cost, order_cost, stockout_cost)
+#   -> (holding, ordering, stockout, ending_inventory)
+SIGNATURE = "Tuple((f8, f8, f8, i8))(i8, i8, i8, i8[:], i8[:], f8, f8, f8)"
+
+
+def build() -> None:
+    cc = CC("inventory_kernel")
+    cc.output_dir = str(Path(__file__).resolve().parent)
+    cc.export("simulate", SIGNATURE)(simulate)
+    cc.compile()
+
+
+if __name__ == "__main__":
+    build()
@@ -1,6 +1,21 @@
+import sys
+
 from langchain.tools import tool
-import random
-import simpy
+import numpy as np
+
+try:
+    # Ahead-of-time build from build_kernel.py; no JIT warm-up on first call.
+    from tools.simpy.inventory_kernel import simulate as _simulate
+except ImportError:
+    from tools.simpy.kernel import simulate as _simulate
+
+    try:
+        from numba import njit
+    except ImportError:  # pinned in requirements.txt; plain Python keeps working without it
+        pass
+    else:
+        _simulate = njit(cache=True)(_simulate)
+
 
 @tool
 def run_simulation(
@@ -8,7 +23,7 @@ def run_simulation(
     S: int,              # order-up-to level
 ) -> dict:
     """
-    SimPy simulation of a single-product (s, S) inventory control system.
+    Simulation of a single-product (s, S) inventory control system.
 
     The model:
     ----------
@@ -68,7 +83,7 @@ def run_simulation(
     """
 
     days = 365
-    demand_mean = 5     # avg daily demand (Poisson-like)
+    demand_mean = 5     # avg daily demand (Poisson)
     lead_time_min = 2
     lead_time_max = 5
     holding_cost = 1.0
@@ -76,88 +91,25 @@ def run_simulation(
     stockout_cost = 5.0
     seed = 1
 
-    if seed is not None:
-        random.seed(seed)
+    # Sample the whole horizon up front so the daily loop is pure numeric code.
+    rng = np.random.default_rng(seed)
+    demands = rng.poisson(demand_mean, days)
+    lead_times = rng.integers(lead_time_min, lead_time_max + 1, size=days)
 
 
-    print(f"Running simulation with s={s}, S={S}, seed={seed}")
-
-
-    env = simpy.Environment()
-
-    # State variables
-    inventory = {"level": S}
-    cost = {
-        "holding": 0.0,
-        "ordering": 0.0,
-        "stockout": 0.0,
-    }
+    print(f"Running simulation with s={s}, S={S}, seed={seed}", file=sys.stderr)
 
-    def generate_demand(mean):
-        """Tiny Poisson-like generator without numpy."""
-        # approximate Poisson by summing Bernoulli trials
-        return sum(1 for _ in range(mean * 2) if random.random() < 0.5)
-
-    def inventory_process(env, inventory, cost):
-        on_order = 0
-        arrival_event = None
-
-        for day in range(days):
-            # ---------------------------------------------------
-            # 1. Check if scheduled replenishment arrives today
-            # ---------------------------------------------------
-            if arrival_event and arrival_event.triggered:
-                inventory["level"] += on_order
-                on_order = 0
-                arrival_event = None
-
-            # ---------------------------------------------------
-            # 2. Demand realization
-            # ---------------------------------------------------
-            demand = generate_demand(demand_mean)
-            if demand <= inventory["level"]:
-                inventory["level"] -= demand
-            else:
-                shortage = demand - inventory["level"]
-                inventory["level"] = 0
-                cost["stockout"] += shortage * stockout_cost
-
-            # ---------------------------------------------------
-            # 3. Holding cost
-            # ---------------------------------------------------
-            cost["holding"] += inventory["level"] * holding_cost
-
-            # ---------------------------------------------------
-            # 4. Reorder decision (s, S)
-            # ---------------------------------------------------
-            if inventory["level"] <= s and on_order == 0:
-                qty = S - inventory["level"]
-                on_order = qty
-                cost["ordering"] += order_cost
-
-                # schedule arrival
-                delay = random.randint(lead_time_min, lead_time_max)
-                arrival_event = env.timeout(delay)
-
-            # ---------------------------------------------------
-            # 5. Advance one day
-            # ---------------------------------------------------
-            yield env.timeout(1)
-
-    # Start the inventory process
-    env.process(inventory_process(env, inventory, cost))
-
-    # Run
-    env.run()
+    holding, ordering, stockout, ending = _simulate(
+        s, S, days, demands, lead_times, holding_cost, order_cost, stockout_cost
+    )
 
     # Final output
-    total_cost = cost["holding"] + cost["ordering"] + cost["stockout"]
     return {
-        "total_cost": total_cost,
-        "holding_cost": cost["holding"],
-        "ordering_cost": cost["ordering"],
-        "stockout_cost": cost["stockout"],
-        "ending_inventory": inventory["level"]
+        "total_cost": float(holding + ordering + stockout),
+        "holding_cost": float(holding),
+        "ordering_cost": float(ordering),
+        "stockout_cost": float(stockout),
+        "ending_inventory": int(ending)
     }
 
 
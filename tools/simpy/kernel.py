@@ -0,0 +1,53 @@
+"""
+Pure numeric kernel of the (s, S) inventory simulation.
+
+Kept free of Python objects so it can be JIT-compiled by numba at runtime or
+compiled ahead of time by ``build_kernel.py``.
+"""
+
+
+def simulate(s, S, days, demands, lead_times, holding_cost, order_cost, stockout_cost):
+    """
+    Daily (s, S) loop over pre-sampled ``demands`` and ``lead_times``.
+    Returns ``(holding, ordering, stockout, ending_inventory)``.
+    """
+    level = S
+    on_order = 0
+    arrival_day = -1
+    holding = 0.0
+    ordering = 0.0
+    stockout = 0.0
+
+    for day in range(days):
+        # ---------------------------------------------------
+        # 1. Check if scheduled replenishment arrives today
+        # ---------------------------------------------------
+        if arrival_day == day:
+            level += on_order
+            on_order = 0
+            arrival_day = -1
+
+        # ---------------------------------------------------
+        # 2. Demand realization
+        # ---------------------------------------------------
+        demand = demands[day]
+        if demand <= level:
+            level -= demand
+        else:
+            stockout += (demand - level) * stockout_cost
+            level = 0
+
+        # ---------------------------------------------------
+        # 3. Holding cost
+        # ---------------------------------------------------
+        holding += level * holding_cost
+
+        # ---------------------------------------------------
+        # 4. Reorder decision (s, S)
+        # ---------------------------------------------------
+        if level <= s and on_order == 0:
+            on_order = S - level
+            ordering += order_cost
+            arrival_day = day + lead_times[day]
+
+    return holding, ordering, stockout, level
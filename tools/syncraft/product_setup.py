@@ -15,12 +15,43 @@ These helpers always:
   - Persist the updated list back to ``products.json``
 """
 
+import sys
 from typing import Any, Dict, List
 
 from langchain_core.tools import tool
+from typing_extensions import NotRequired, TypedDict
 
-from app.state.product_state import load_products, save_products, reset_products
-from app.state.graph_state import load_graph
+from app.state.product_state import PRODUCTS_LOCK, load_products, save_products, reset_products
+from app.state.graph_state import GRAPH_LOCK, current_graph, current_graph_nodes_sorted
+
+
+class ProductRouteSpec(TypedDict):
+    """One product route for ``add_product_routes``; ``color`` defaults to "red"."""
+    label: str
+    route: List[str]
+    color: NotRequired[str]
+
+
+def _index_by_label(products: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Position of the first product with each label. Unlabeled products are not
+    indexed, so they are carried through mutations unchanged.
+    """
+    index: Dict[str, int] = {}
+    for i, p in enumerate(products):
+        if "label" in p:
+            index.setdefault(p["label"], i)
+    return index
+
+
+def _upsert(products: List[Dict[str, Any]], index: Dict[str, int], record: Dict[str, Any]) -> None:
+    """Replace the product with ``record``'s label in place, or append ``record``."""
+    i = index.get(record["label"])
+    if i is None:
+        index[record["label"]] = len(products)
+        products.append(record)
+    else:
+        products[i] = record
 
 
 @tool
@@ -39,40 +70,87 @@ def add_product_route(label: str, route: List[str], color: str = "red") -> Dict[
           - {"success": False, "error": str, "missing_nodes": [...]} if some
             stations in the route do not exist in the current graph.
     """
-    print("Toolcall: add_product_route")
+    print("Toolcall: add_product_route", file=sys.stderr)
 
     # Validate that all stations in the route exist as nodes in the graph.
-    graph = load_graph()
-    missing_nodes = [station for station in route if station not in graph.nodes]
-    if missing_nodes:
-        return {
-            "success": False,
-            "error": "Some stations in the product route do not exist in the simulation graph.",
-            "missing_nodes": missing_nodes,
-            "available_nodes": sorted(list(graph.nodes)),
-        }
-
-    products = load_products()
-
-    # Overwrite existing product with same label, if any.
-    updated = False
-    for p in products:
-        if p.get("label") == label:
-            p["route"] = list(route)
-            p["color"] = color
-            updated = True
-            break
-
-    if not updated:
-        products.append(
+    # ``nodes`` is a dict, so each membership test is a single hash lookup.
+    with GRAPH_LOCK:
+        nodes = current_graph()["nodes"] if route else {}
+        missing_nodes = [station for station in route if station not in nodes]
+        if missing_nodes:
+            return {
+                "success": False,
+                "error": "Some stations in the product route do not exist in the simulation graph.",
+                "missing_nodes": missing_nodes,
+                "available_nodes": current_graph_nodes_sorted(),
+            }
+
+    with PRODUCTS_LOCK:
+        products = load_products()
+
+        # Overwrite existing product with same label, if any; an existing
+        # label keeps its position in the list.
+        _upsert(
+            products,
+            _index_by_label(products),
             {
                 "label": label,
                 "route": list(route),
                 "color": color,
-            }
+            },
         )
 
-    save_products(products)
+        save_products(products)
+    return {"success": True}
+
+
+@tool
+def add_product_routes(routes: List[ProductRouteSpec]) -> Dict[str, Any]:
+    """
+    Add or update several product routes at once.
+
+    Args:
+        routes: List of product routes, each with ``label``, ``route`` and
+            optionally ``color`` (default "red"), as for ``add_product_route``.
+
+    Returns:
+        Dict with either:
+          - {"success": True} if all routes were saved, or
+          - {"success": False, "error": str, "missing_nodes": {label: [...]}} if
+            some routes use stations not in the current graph; nothing is saved.
+    """
+    print("Toolcall: add_product_routes", file=sys.stderr)
+
+    # Validate every route against one read of the graph before changing anything.
+    with GRAPH_LOCK:
+        nodes = current_graph()["nodes"]
+        missing_nodes: Dict[str, List[str]] = {}
+        for item in routes:
+            missing = [station for station in item["route"] if station not in nodes]
+            if missing:
+                missing_nodes[item["label"]] = missing
+        if missing_nodes:
+            return {
+                "success": False,
+                "error": "Some stations in the product routes do not exist in the simulation graph.",
+                "missing_nodes": missing_nodes,
+                "available_nodes": current_graph_nodes_sorted(),
+            }
+
+    with PRODUCTS_LOCK:
+        products = load_products()
+        index = _index_by_label(products)
+        for item in routes:
+            _upsert(
+                products,
+                index,
+                {
+                    "label": item["label"],
+                    "route": list(item["route"]),
+                    "color": item.get("color", "red"),
+                },
+            )
+        save_products(products)
     return {"success": True}
 
 
@@ -81,10 +159,11 @@ def remove_product_route(label: str) -> None:
     """
     Remove a product route from the configuration by label.
     """
-    print("Toolcall: remove_product_route")
-    products = load_products()
-    products = [p for p in products if p.get("label") != label]
-    save_products(products)
+    print("Toolcall: remove_product_route", file=sys.stderr)
+    with PRODUCTS_LOCK:
+        products = load_products()
+        products = [p for p in products if p.get("label") != label]
+        save_products(products)
 
 
 @tool
@@ -92,7 +171,7 @@ def get_product_routes() -> List[Dict[str, Any]]:
     """
     Return the full list of configured product routes.
     """
-    print("Toolcall: get_product_routes")
+    print("Toolcall: get_product_routes", file=sys.stderr)
     return load_products()
 
 
@@ -101,5 +180,6 @@ def reset_product_routes() -> None:
     """
     Reset / clear all configured product routes.
     """
-    print("Toolcall: reset_product_routes")
-    reset_products()
\ No newline at end of file
+    print("Toolcall: reset_product_routes", file=sys.stderr)
+    with PRODUCTS_LOCK:
+        reset_products()
\ No newline at end of file
@@ -5,16 +5,23 @@ LangChain tools for manipulating the shared graph stored in ``app/state/graph.js
 
 These helpers always:
 - Safely resolve the JSON path via ``state.state.GRAPH_PATH`` (robust under Streamlit)
-- Load the current graph from disk
+- Load the current graph (from disk, or the turn's ``GraphTransaction``)
 - Apply the requested mutation
-- Persist the updated graph back to ``graph.json``
+- Persist the updated graph back to ``graph.json`` (at the end of the transaction, if any)
+
+Tool calls of one agent turn run in order, but all chat sessions share the graph,
+so every load -> mutate -> save sequence holds ``GRAPH_LOCK``.
 """
 
 import random
+import sys
 from langchain_core.tools import tool
-import networkx as nx
 
-from app.state.graph_state import load_graph, save_graph, load_graph_json, reset_graph_state
+from app.state.graph_state import Graph, GRAPH_LOCK, current_graph, commit_graph, current_graph_json, reset_graph_state
+
+# Own generator for default node attributes, so seeding the global ``random``
+# elsewhere does not change (and is not disturbed by) new stations.
+_rng = random.Random()
 
 
 @tool
@@ -33,19 +40,19 @@ def add_node(label: str, x: float, y: float) -> bool:
     Returns:
         True if the node was created or updated.
     """
-    print("Toolcall: Add node")
-    graph: nx.DiGraph = load_graph()
-
-    # Use the label as the node id, and store visual attributes expected by the UI.
-    graph.add_node(
-        label,
-        pos=(x, y),
-        color="#4C78A8",
-        process_time=random.uniform(0.5, 2.0),  # Default random process time between 0.5 and 2.0
-        capacity=1,
-    )
-
-    save_graph(graph)
+    print("Toolcall: Add node", file=sys.stderr)
+    with GRAPH_LOCK:
+        graph: Graph = current_graph()
+
+        # Use the label as the node id, and store visual attributes expected by the UI.
+        graph["nodes"].setdefault(label, {}).update(
+            pos=[x, y],
+            color="#4C78A8",
+            process_time=_rng.uniform(0.5, 2.0),  # Default random process time between 0.5 and 2.0
+            capacity=1,
+        )
+
+        commit_graph(graph)
     return True
 
 
@@ -57,11 +64,15 @@ def remove_node(label: str) -> None:
     Args:
         label: Node id / label to remove.
     """
-    print("Toolcall: Remove node")
-    graph: nx.DiGraph = load_graph()
-    if label in graph:
-        graph.remove_node(label)
-        save_graph(graph)
+    print("Toolcall: Remove node", file=sys.stderr)
+    with GRAPH_LOCK:
+        graph: Graph = current_graph()
+        if label in graph["nodes"]:
+            del graph["nodes"][label]
+            # Drop the connections to and from the removed station as well.
+            for edge in [e for e in graph["edges"] if label in e]:
+                del graph["edges"][edge]
+            commit_graph(graph)
 
 
 @tool
@@ -74,14 +85,14 @@ def move_node(label: str, x_new: float, y_new: float):
         x_new: New X coordinate for the layout.
         y_new: New Y coordinate for the layout.
     """
-    print(f"Toolcall: Move node {label} to new pos {x_new}, {y_new}")
-    graph: nx.DiGraph = load_graph()
-
-    if graph.has_node(label):
-        # Update the stored position used by the Plotly UI.
-        graph.nodes[label]["pos"] = (x_new, y_new)
+    print(f"Toolcall: Move node {label} to new pos {x_new}, {y_new}", file=sys.stderr)
+    with GRAPH_LOCK:
+        graph: Graph = current_graph()
 
-    save_graph(graph)
+        if label in graph["nodes"]:
+            # Update the stored position used by the Plotly UI.
+            graph["nodes"][label]["pos"] = [x_new, y_new]
+            commit_graph(graph)
 
 @tool
 def add_edge(src: str, dst: str) -> None:
@@ -92,17 +103,19 @@ def add_edge(src: str, dst: str) -> None:
         src: Source node id / label.
         dst: Destination node id / label.
     """
-    print("Toolcall: Add edge")
-    graph: nx.DiGraph = load_graph()
+    print("Toolcall: Add edge", file=sys.stderr)
+    with GRAPH_LOCK:
+        graph: Graph = current_graph()
 
-    # Ensure nodes exist (no-op if they already do).
-    if src not in graph:
-        graph.add_node(src, pos=(0.0, 0.0), label=src, color="#4C78A8")
-    if dst not in graph:
-        graph.add_node(dst, pos=(1.0, 0.0), label=dst, color="#4C78A8")
+        # Ensure nodes exist (no-op if they already do).
+        nodes = graph["nodes"]
+        if src not in nodes:
+            nodes[src] = {"pos": [0.0, 0.0], "label": src, "color": "#4C78A8"}
+        if dst not in nodes:
+            nodes[dst] = {"pos": [1.0, 0.0], "label": dst, "color": "#4C78A8"}
 
-    graph.add_edge(src, dst, label="", color="rgba(90,90,90,0.8)")
-    save_graph(graph)
+        graph["edges"].setdefault((src, dst), {}).update(label="", color="rgba(90,90,90,0.8)")
+        commit_graph(graph)
 
 
 @tool
@@ -114,21 +127,24 @@ def remove_edge(src: str, dst: str) -> None:
         src: Source node id / label.
         dst: Destination node id / label.
     """
-    print("Toolcall: Remove edge")
-    graph: nx.DiGraph = load_graph()
-    if graph.has_edge(src, dst):
-        graph.remove_edge(src, dst)
-        save_graph(graph)
+    print("Toolcall: Remove edge", file=sys.stderr)
+    with GRAPH_LOCK:
+        graph: Graph = current_graph()
+        if (src, dst) in graph["edges"]:
+            del graph["edges"][(src, dst)]
+            commit_graph(graph)
 
 @tool
 def get_graph_json() -> dict:
     """
-    Returns the raw adjacency JSON data respresenting the current graph.
+    Returns the raw node-link JSON data respresenting the current graph.
 
-    This is the exact structure produced by ``networkx.json_graph.adjacency_data``.
+    This is the structure stored in ``graph.json``: ``nodes`` (with ``id``) and
+    ``edges`` (with ``source`` / ``target``) lists.
     """
-    print("Toolcall: Get graph json")
-    graph_json = load_graph_json()
+    print("Toolcall: Get graph json", file=sys.stderr)
+    with GRAPH_LOCK:
+        graph_json = current_graph_json()
     return graph_json
 
 
@@ -137,5 +153,6 @@ def reset_graph() -> None:
     """
     Reset the shared graph to an empty directed graph.
     """
-    print("Toolcall: Reset graph")
-    reset_graph_state()
\ No newline at end of file
+    print("Toolcall: Reset graph", file=sys.stderr)
+    with GRAPH_LOCK:
+        reset_graph_state()